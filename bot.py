@@ -1,24 +1,34 @@
 import os
 import re
+import hmac
 import sqlite3
 import logging
+import logging.handlers
+import atexit
+import queue
 import asyncio
-from datetime import datetime, timedelta
-import pytz
+import threading
+import time
+from collections import defaultdict, deque
+from datetime import date, datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
 from fastapi import FastAPI, Request, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse, Response
 import uvicorn
+import orjson
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
-from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
 from apscheduler.executors.asyncio import AsyncIOExecutor
+from apscheduler.jobstores.memory import MemoryJobStore
+from apscheduler.events import EVENT_JOB_MAX_INSTANCES, EVENT_JOB_MISSED
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, Bot
 from telegram.ext import (
     Application, CallbackContext, CallbackQueryHandler,
     CommandHandler, MessageHandler, filters, ConversationHandler
 )
+from telegram.request import HTTPXRequest
+from telegram.error import RetryAfter
 from dotenv import load_dotenv
 from typing import Optional, List, Set, Dict, Tuple
-import aiofiles
 from concurrent.futures import ThreadPoolExecutor
 
 # ========== Загрузка переменных окружения ==========
@@ -31,14 +41,37 @@ TOKEN = os.getenv('TELEGRAM_TOKEN')
 WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET')
 CHANNEL_ID = int(os.getenv('CHANNEL_ID')) if os.getenv('CHANNEL_ID') else None
 ADMIN_CHAT_ID = int(os.getenv('ADMIN_CHAT_ID')) if os.getenv('ADMIN_CHAT_ID') else None
-TIMEZONE = pytz.timezone('Europe/Moscow')
+TIMEZONE = ZoneInfo('Europe/Moscow')
 MAX_TEXT_LENGTH = 4000
 MAX_CONGRAT_TEXT_LENGTH = 500
 MAX_ANNOUNCE_NEWS_TEXT_LENGTH = 300
 BAD_WORDS_FILE = 'bad_words.txt'
 DEFAULT_BAD_WORDS = ["хуй", "пизда", "блять", "блядь", "ебать", "сука"]
+BAD_WORDS_RELOAD_INTERVAL_SECONDS = 60
 MAX_NAME_LENGTH = 50
 CONVERSATION_TIMEOUT_MINUTES = 15
+PUBLISH_CONCURRENCY = 5
+# Telegram ограничивает частоту сообщений в один канал — не больше 20 в минуту
+PUBLISH_INTERVAL_SECONDS = 3.0
+# Сколько попутка ждёт слот отправки в канал, прежде чем уйти на модерацию;
+# заметно меньше UPDATE_PROCESS_TIMEOUT_SECONDS, чтобы обработчик успел ответить пользователю
+PUBLISH_SLOT_WAIT_SECONDS = 5.0
+DB_POOL_SIZE = 5
+UPDATE_QUEUE_SIZE = 1000
+UPDATE_WORKERS = 4
+UPDATE_DRAIN_TIMEOUT_SECONDS = 10
+UPDATE_PROCESS_TIMEOUT_SECONDS = 25
+DB_BUSY_TIMEOUT_SECONDS = 5.0
+DB_OPTIMIZE_INTERVAL_HOURS = 24
+HTTP_POOL_SIZE = 32
+HTTP_POOL_TIMEOUT = 5.0
+HTTP_CONNECT_TIMEOUT = 5.0
+HTTP_READ_TIMEOUT = 30.0
+HTTP_VERSION = "2"
+RATE_LIMIT_MAX_REQUESTS = 5
+RATE_LIMIT_WINDOW_SECONDS = 3600
+APPLICATION_CACHE_TTL_SECONDS = 60
+APPLICATION_CACHE_MAX_SIZE = 1024
 
 # ========== НОВАЯ ФИЧА: Автопубликация попуток ==========
 AUTO_PUBLISH_CARPOOL = os.getenv('AUTO_PUBLISH_CARPOOL', '').lower() == 'true'
@@ -59,6 +92,8 @@ BACK_BUTTON = [[InlineKeyboardButton("🔙 Вернуться в начало",
 DB_FILE = 'db.sqlite'
 NEWS_CHANNEL_LINK = "https://t.me/nb_mir_nikolaevsk"
 NEWS_CHANNEL_TEXT = "Небольшой Мир: Николаевск"
+CHANNEL_HASHTAG = "#ЧтоПочёмНиколаевск"
+NEWS_CHANNEL_FOOTER = f"📰 <a href='{NEWS_CHANNEL_LINK}'>Новости нашего городка — {NEWS_CHANNEL_TEXT}</a>"
 
 # ========== Тексты, шаблоны и типы ==========
 EXAMPLE_TEXTS = {
@@ -76,6 +111,28 @@ EXAMPLE_TEXTS = {
     "news": "15.01 в нашем городе открыли новую детскую площадку!"
 }
 
+# Подсказки собираются один раз при загрузке, а не на каждом шаге диалога
+WELCOME_TEXT = (
+    "👋 *Добро пожаловать в бот канала «Что почем? Николаевск»!* 🛒\n\n"
+    "Здесь вы можете:\n"
+    "🎉 *Поздравить* кого-то с праздником\n"
+    "🚗 *Оставить попутку*\n"
+    "📢 *Разместить объявление* (работа, потеря, услуга)\n\n"
+    "Выберите, что хотите сделать:"
+)
+SENDER_NAME_PROMPT = f"🎉 Вы собираетесь отправить поздравление!\n\nУкажите своё имя, чтобы подписать поздравление (например: *{EXAMPLE_TEXTS['sender_name']}*)."
+RECIPIENT_NAME_PROMPT = f"🎉 Отлично! Теперь укажите, кого поздравляете.\n\nНапример: *{EXAMPLE_TEXTS['recipient_name']}*.\nМожно написать имя человека, группу или организацию."
+INVALID_NAME_MESSAGE = f"Пожалуйста, введите корректное имя (от 2 до {MAX_NAME_LENGTH} символов)."
+CUSTOM_CONGRAT_PROMPT = f"Напишите своё поздравление (до {MAX_CONGRAT_TEXT_LENGTH} символов):"
+ANNOUNCE_TEXT_PROMPTS = {
+    key: f"Введите текст объявления (до {MAX_TEXT_LENGTH} символов).\nПример: {example}"
+    for key, example in EXAMPLE_TEXTS["announcement"].items()
+}
+NEWS_TEXT_PROMPT = (
+    "📰 Коротко опишите, что произошло, где и когда. При необходимости можно прикрепить фото.\n\n"
+    f"Введите текст новости (до {MAX_ANNOUNCE_NEWS_TEXT_LENGTH} символов):"
+)
+
 HOLIDAYS = {
     "🎄 Новый год": "01-01",
     "🪖 23 Февраля": "02-23",
@@ -94,6 +151,29 @@ HOLIDAY_TEMPLATES = {
     "🤝 4 Ноября": "С Днём народного единства! 🤝 Пусть в вашей жизни будет согласие, доброта и взаимопонимание!"
 }
 
+# Готовые шаблоны: при отправке подставляются только данные пользователя
+HOLIDAY_CONGRAT_TEXTS = {
+    holiday: "{from_name} поздравляет {to_name} с " + f"{holiday}! {HOLIDAY_TEMPLATES.get(holiday, 'С праздником!')}".replace('{', '{{').replace('}', '}}')
+    for holiday in HOLIDAYS
+}
+RIDE_POST_TEMPLATE = (
+    "🚗 <b>{ride_type}</b>\n"
+    "📍 <b>Откуда:</b> {ride_from}\n"
+    "📍 <b>Куда:</b> {ride_to}\n"
+    "⏰ <b>Время:</b> {ride_date}\n"
+    "🪑 <b>Мест:</b> {ride_seats}\n"
+    "📞 <b>Телефон:</b> {phone_number}\n"
+    + CHANNEL_HASHTAG.replace('{', '{{').replace('}', '}}')
+)
+ADMIN_CAPTION_TEMPLATE = (
+    "📨 Новая заявка #{app_id}\n"
+    "• Тип: {full_type}\n"
+    "• Фото: {has_photo}\n"
+    "{phone}\n"
+    "• От: @{username} (ID: {user_id})\n"
+    "• Текст: {text}"
+)
+
 REQUEST_TYPES = {
     "congrat": {"name": "🎉 Поздравление", "icon": "🎉"},
     "announcement": {"name": "📢 Объявление", "icon": "📢"},
@@ -105,6 +185,68 @@ ANNOUNCE_SUBTYPES = {
     "lost": "🔍 Потеряли/Нашли"
 }
 
+# Разбор callback_data без поиска подстроки: готовые словари «данные кнопки → ключ»
+CALLBACK_TO_SUBTYPE = {f"subtype_{key}": key for key in ANNOUNCE_SUBTYPES}
+CALLBACK_TO_HOLIDAY = {f"holiday_{holiday}": holiday for holiday in HOLIDAYS}
+# Название типа заявки одним обращением к словарю
+TYPE_NAME_BY_KEY = {key: info["name"] for key, info in REQUEST_TYPES.items()}
+# Фильтры кнопок модерации: предкомпилированные шаблоны с re.ASCII
+APPROVE_CALLBACK_RE = re.compile(r"^approve_\d+$", re.ASCII)
+REJECT_CALLBACK_RE = re.compile(r"^reject_\d+$", re.ASCII)
+
+# ========== Клавиатуры ==========
+# Статичные меню собираются один раз при импорте и переиспользуются во всех обработчиках
+BACK_KEYBOARD = InlineKeyboardMarkup(BACK_BUTTON)
+
+HELP_KEYBOARD = InlineKeyboardMarkup([[InlineKeyboardButton("🔙 Вернуться", callback_data="back_to_start")]])
+
+START_KEYBOARD = InlineKeyboardMarkup([
+    [InlineKeyboardButton("🚗 Попутка", callback_data="carpool")],
+    [InlineKeyboardButton("🎉 Поздравление", callback_data="congrat")],
+    [InlineKeyboardButton("📢 Объявление", callback_data="announcement")],
+    [InlineKeyboardButton("🗞️ Новость от жителя", callback_data="news")],
+    [InlineKeyboardButton("ℹ️ Как это работает?", callback_data="help_inline")]
+])
+
+ANNOUNCE_SUBTYPE_KEYBOARD = InlineKeyboardMarkup([
+    [InlineKeyboardButton(subtype, callback_data=f"subtype_{key}")]
+    for key, subtype in ANNOUNCE_SUBTYPES.items()
+] + BACK_BUTTON)
+
+HOLIDAY_KEYBOARD = InlineKeyboardMarkup([
+    [InlineKeyboardButton(holiday, callback_data=f"holiday_{holiday}")]
+    for holiday in HOLIDAYS
+] + [
+    [InlineKeyboardButton("🎉 Другой праздник", callback_data="custom_congrat")],
+    [InlineKeyboardButton("🔙 Вернуться в начало", callback_data="back_to_start")]
+])
+
+PUBLISH_DATE_KEYBOARD = InlineKeyboardMarkup([
+    [InlineKeyboardButton("📅 Сегодня", callback_data="publish_today")],
+    [InlineKeyboardButton("📆 Указать дату", callback_data="publish_custom_date")],
+    [InlineKeyboardButton("🔙 Вернуться в начало", callback_data="back_to_start")]
+])
+CARPOOL_TYPE_KEYBOARD = InlineKeyboardMarkup([
+    [InlineKeyboardButton("Ищу попутчиков", callback_data="carpool_need")],
+    [InlineKeyboardButton("Предлагаю поездку", callback_data="carpool_offer")],
+    [InlineKeyboardButton("🔙 Вернуться в начало", callback_data="back_to_start")]
+])
+CENSOR_KEYBOARD = InlineKeyboardMarkup([
+    [InlineKeyboardButton("✅ Отправить", callback_data="accept_censor")],
+    [InlineKeyboardButton("✏️ Изменить", callback_data="edit_censor")]
+])
+CENSOR_EDIT_TEXT_KEYBOARD = InlineKeyboardMarkup([
+    [InlineKeyboardButton("✅ Принять и отправить", callback_data="accept_censor")],
+    [InlineKeyboardButton("✏️ Изменить текст", callback_data="edit_censor")]
+])
+
+def moderation_keyboard(app_id: int) -> InlineKeyboardMarkup:
+    # Кнопки модерации зависят от номера заявки, поэтому собираются на каждую заявку
+    return InlineKeyboardMarkup([
+        [InlineKeyboardButton("✅ Одобрить", callback_data=f"approve_{app_id}"),
+         InlineKeyboardButton("❌ Отклонить", callback_data=f"reject_{app_id}")]
+    ])
+
 # ========== Состояния диалога ==========
 (TYPE_SELECTION, SENDER_NAME_INPUT, RECIPIENT_NAME_INPUT, CONGRAT_HOLIDAY_CHOICE,
  CUSTOM_CONGRAT_MESSAGE_INPUT, CONGRAT_DATE_CHOICE, CONGRAT_DATE_INPUT,
@@ -113,18 +255,60 @@ ANNOUNCE_SUBTYPES = {
  RIDE_DATE_INPUT, RIDE_SEATS_INPUT, RIDE_PHONE_INPUT, CARPOOL_SUBTYPE_SELECTION) = range(19)
 
 # ========== Логирование ==========
+# Запись в файл и консоль идёт в отдельном потоке: цикл событий только кладёт запись в очередь
+log_formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+log_file_handler = logging.FileHandler('bot.log')
+log_file_handler.setFormatter(log_formatter)
+log_stream_handler = logging.StreamHandler()
+log_stream_handler.setFormatter(log_formatter)
+log_queue = queue.SimpleQueue()
+log_listener = logging.handlers.QueueListener(log_queue, log_file_handler, log_stream_handler)
 logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    format='%(message)s',
     level=logging.INFO,
-    handlers=[logging.FileHandler('bot.log'), logging.StreamHandler()]
+    handlers=[logging.handlers.QueueHandler(log_queue)]
 )
+log_listener.start()
+atexit.register(log_listener.stop)
+# Пропуски запусков задач APScheduler пишет как WARNING; они логируются в log_skipped_job на уровне INFO
+logging.getLogger('apscheduler.scheduler').setLevel(logging.ERROR)
+logging.getLogger('apscheduler.executors.default').setLevel(logging.ERROR)
 logger = logging.getLogger(__name__)
 
 # ========== Глобальные переменные ==========
 application_lock = asyncio.Lock()
+# Устанавливается, когда приложение полностью инициализировано; до этого application может быть недостроен
+application_ready = asyncio.Event()
 application: Optional[Application] = None
+# Отдельный клиент для публикаций в канал: свой пул соединений, не общий с ответами пользователям
+publisher_bot: Optional[Bot] = None
+scheduler: Optional[AsyncIOScheduler] = None
 bad_words_cache: Set[str] = set()
-db_executor = ThreadPoolExecutor(max_workers=5)
+bad_words_pattern: Optional[re.Pattern] = None
+bad_words_mtime: Optional[float] = None
+bad_words_min_length = 0
+bad_words_need_cyrillic = False
+db_executor = ThreadPoolExecutor(max_workers=DB_POOL_SIZE, thread_name_prefix="db")
+_db_local = threading.local()
+db_connections: List[sqlite3.Connection] = []
+# Обновления от вебхука ждут здесь, пока их не заберёт один из обработчиков update_worker
+update_queue: asyncio.Queue = asyncio.Queue(maxsize=UPDATE_QUEUE_SIZE)
+update_workers: List[asyncio.Task] = []
+# Момент (по часам цикла событий), раньше которого не начинается следующая отправка в канал;
+# после ответа 429 сдвигается на retry_after
+next_publish_at = 0.0
+# Ожидающие слот отправки выстраиваются в очередь: посты уходят в канал в порядке заявок
+publish_slot_lock = asyncio.Lock()
+# Очередь публикации менялась с последней проверки (одобрение, возврат после ошибки, запуск)
+publish_queue_dirty = True
+# Ближайшая будущая дата публикации среди одобренных заявок (ГГГГ-ММ-ДД) или None
+next_due_publish_date: Optional[str] = None
+# Моменты (time.monotonic) последних заявок каждого пользователя для ограничения частоты
+rate_limit_history: Dict[int, deque] = defaultdict(lambda: deque(maxlen=RATE_LIMIT_MAX_REQUESTS))
+# Недавно прочитанные заявки: app_id → (момент истечения по time.monotonic, строка)
+application_cache: Dict[int, Tuple[float, Dict]] = {}
+# Растёт при каждом изменении заявок: чтение, начатое до записи, не кладёт в кэш устаревшую строку
+application_cache_generation = 0
 
 # ========== База данных (оптимизированная версия) ==========
 def run_in_executor(func, *args):
@@ -132,13 +316,70 @@ def run_in_executor(func, *args):
     return loop.run_in_executor(db_executor, func, *args)
 
 def _get_db_connection() -> sqlite3.Connection:
-    conn = sqlite3.connect(DB_FILE)
-    conn.row_factory = sqlite3.Row
+    # Одно долгоживущее соединение на поток пула db_executor
+    conn = getattr(_db_local, 'conn', None)
+    if conn is None:
+        # timeout — ожидание блокировки другим писателем вместо немедленного "database is locked"
+        conn = sqlite3.connect(DB_FILE, timeout=DB_BUSY_TIMEOUT_SECONDS, check_same_thread=False)
+        # Настройки ниже действуют на соединение; режим WAL хранится в файле и включается в init_db
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA mmap_size=134217728")
+        conn.execute("PRAGMA cache_size=-64000")
+        _db_local.conn = conn
+        db_connections.append(conn)
     return conn
 
+def _open_pooled_connection(barrier: threading.Barrier):
+    _get_db_connection()
+    try:
+        # Поток ждёт остальных, чтобы каждая задача прогрева заняла свой поток пула
+        barrier.wait(timeout=5)
+    except threading.BrokenBarrierError:
+        pass
+
+async def warm_db_pool():
+    # Открываем все соединения пула заранее, чтобы первые запросы не платили за connect и PRAGMA
+    barrier = threading.Barrier(DB_POOL_SIZE)
+    await asyncio.gather(*(run_in_executor(_open_pooled_connection, barrier) for _ in range(DB_POOL_SIZE)))
+    logger.info("Открыто соединений с БД: %s", len(db_connections))
+
+def close_db_connections():
+    if db_connections:
+        try:
+            db_connections[0].execute("PRAGMA optimize")
+        except sqlite3.Error as e:
+            logger.warning("PRAGMA optimize не выполнен: %s", e)
+    while db_connections:
+        db_connections.pop().close()
+
+async def optimize_db():
+    # Соединения живут весь срок работы бота, поэтому статистику планировщика запросов обновляем и по расписанию
+    try:
+        await run_in_executor(_db_execute_sync, "PRAGMA optimize")
+    except sqlite3.Error as e:
+        logger.warning("PRAGMA optimize не выполнен: %s", e)
+
+# Колонки, которых может не быть в базах старых версий бота
+MIGRATED_COLUMNS = {
+    'from_name': 'TEXT',
+    'photo_id': 'TEXT',
+    'phone_number': 'TEXT',
+    'congrat_type': 'TEXT',
+    'ride_from': 'TEXT',
+    'ride_to': 'TEXT',
+    'ride_date': 'TEXT',
+    'ride_seats': 'TEXT',
+    'original_link': 'TEXT'
+}
+# Версия схемы в PRAGMA user_version: после миграции колонки при старте больше не сверяются
+SCHEMA_VERSION = 1
+
 def _init_db_sync():
     with _get_db_connection() as conn:
-        conn.execute("""
+        conn.execute("PRAGMA journal_mode=WAL")
+        # DDL одним скриптом: SQLite разбирает таблицу и индекс за один вызов
+        conn.executescript("""
             CREATE TABLE IF NOT EXISTS applications (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 user_id INTEGER NOT NULL,
@@ -160,142 +401,333 @@ def _init_db_sync():
                 ride_date TEXT,
                 ride_seats TEXT,
                 original_link TEXT
-            )
-        """)
-        # Проверка и добавление отсутствующих колонок
-        cursor = conn.cursor()
-        cursor.execute("PRAGMA table_info(applications)")
-        columns = {row[1] for row in cursor.fetchall()}
-        if 'photo_id' not in columns:
-            conn.execute("ALTER TABLE applications ADD COLUMN photo_id TEXT")
-        if 'ride_from' not in columns:
-            conn.execute("ALTER TABLE applications ADD COLUMN ride_from TEXT")
-        if 'ride_to' not in columns:
-            conn.execute("ALTER TABLE applications ADD COLUMN ride_to TEXT")
-        if 'ride_date' not in columns:
-            conn.execute("ALTER TABLE applications ADD COLUMN ride_date TEXT")
-        if 'ride_seats' not in columns:
-            conn.execute("ALTER TABLE applications ADD COLUMN ride_seats TEXT")
-        if 'original_link' not in columns:
-            conn.execute("ALTER TABLE applications ADD COLUMN original_link TEXT")
-        conn.execute("""
-            CREATE INDEX IF NOT EXISTS idx_approved_unpublished 
-            ON applications(status, published_at) 
-            WHERE status = 'approved' AND published_at IS NULL
+            );
+            DROP INDEX IF EXISTS idx_approved_unpublished;
+            CREATE INDEX IF NOT EXISTS idx_approved_unpublished_date
+            ON applications(publish_date)
+            WHERE status = 'approved' AND published_at IS NULL;
+            CREATE INDEX IF NOT EXISTS idx_publishing
+            ON applications(id)
+            WHERE status = 'publishing';
+            CREATE INDEX IF NOT EXISTS idx_user_created
+            ON applications(user_id, created_at);
         """)
+        # Проверка и добавление отсутствующих колонок — только для баз старых версий
+        if conn.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(applications)")}
+            for column, column_type in MIGRATED_COLUMNS.items():
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE applications ADD COLUMN {column} {column_type}")
+            conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        # Заявки, забранные в публикацию перед аварийной остановкой, возвращаются в очередь
+        conn.execute("UPDATE applications SET status = 'approved' WHERE status = 'publishing' AND published_at IS NULL")
+        # Статистика для планировщика собирается один раз, дальше её обновляет PRAGMA optimize при остановке
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'").fetchone() is None:
+            conn.execute("ANALYZE")
         conn.commit()
         logger.info("База данных инициализирована.")
 
 async def init_db():
     await run_in_executor(_init_db_sync)
 
+# Блок with соединения — это одна транзакция: COMMIT при выходе, ROLLBACK при ошибке
 def _db_execute_sync(query: str, params: tuple = ()):
     with _get_db_connection() as conn:
         conn.execute(query, params)
-        conn.commit()
 
+# Строки приходят кортежами; имена колонок берутся из cursor.description один раз на запрос,
+# это дешевле, чем sqlite3.Row с последующим dict(row) для каждой строки
 def _db_fetch_one_sync(query: str, params: tuple = ()) -> Optional[Dict]:
     with _get_db_connection() as conn:
-        row = conn.execute(query, params).fetchone()
-        return dict(row) if row else None
+        cur = conn.execute(query, params)
+        row = cur.fetchone()
+        if row is None:
+            return None
+        return dict(zip([column[0] for column in cur.description], row))
 
 def _db_fetch_all_sync(query: str, params: tuple = ()) -> List[Dict]:
     with _get_db_connection() as conn:
-        rows = conn.execute(query, params).fetchall()
-        return [dict(row) for row in rows]
+        cur = conn.execute(query, params)
+        rows = cur.fetchall()
+        names = [column[0] for column in cur.description]
+        return [dict(zip(names, row)) for row in rows]
+
+# Для каждого типа заявки — INSERT только по колонкам, которые этот тип заполняет; остальные остаются NULL
+_COMMON_INSERT_COLUMNS = (
+    'user_id', 'username', 'type', 'subtype', 'text', 'photo_id',
+    'phone_number', 'publish_date', 'original_link'
+)
+_TYPE_INSERT_COLUMNS = {
+    'congrat': _COMMON_INSERT_COLUMNS + ('from_name', 'to_name', 'congrat_type'),
+    'announcement': _COMMON_INSERT_COLUMNS + ('ride_from', 'ride_to', 'ride_date', 'ride_seats'),
+    'news': _COMMON_INSERT_COLUMNS
+}
+# Заявка неизвестного типа сохраняется со всеми колонками
+_ALL_INSERT_COLUMNS = _COMMON_INSERT_COLUMNS + (
+    'from_name', 'to_name', 'congrat_type', 'ride_from', 'ride_to', 'ride_date', 'ride_seats'
+)
+
+def _insert_statement(columns: Tuple[str, ...]) -> Tuple[str, Tuple[str, ...]]:
+    return f"INSERT INTO applications ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})", columns
+
+TYPE_INSERTS = {app_type: _insert_statement(columns) for app_type, columns in _TYPE_INSERT_COLUMNS.items()}
+DEFAULT_INSERT = _insert_statement(_ALL_INSERT_COLUMNS)
 
 def _add_application_sync(data: dict) -> Optional[int]:
+    query, columns = TYPE_INSERTS.get(data['type'], DEFAULT_INSERT)
     with _get_db_connection() as conn:
-        cur = conn.cursor()
-        cur.execute("""
-            INSERT INTO applications (
-                user_id, username, type, subtype, from_name, to_name, 
-                text, photo_id, phone_number, publish_date, congrat_type,
-                ride_from, ride_to, ride_date, ride_seats, original_link
-            )
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
-            data['user_id'], data.get('username'), data['type'], data.get('subtype'),
-            data.get('from_name'), data.get('to_name'), data['text'], data.get('photo_id'),
-            data.get('phone_number'), data.get('publish_date'), data.get('congrat_type'),
-            data.get('ride_from'), data.get('ride_to'), data.get('ride_date'), data.get('ride_seats'),
-            data.get('original_link')
-        ))
-        app_id = cur.lastrowid
-        conn.commit()
-        return app_id
+        cur = conn.execute(query, tuple(data.get(column) for column in columns))
+        return cur.lastrowid
 
 async def add_application(data: dict) -> Optional[int]:
-    return await run_in_executor(_add_application_sync, data)
+    app_id = await run_in_executor(_add_application_sync, data)
+    if app_id:
+        rate_limit_history[data['user_id']].append(time.monotonic())
+    return app_id
 
 async def get_application_details(app_id: int) -> Optional[Dict]:
-    return await run_in_executor(_db_fetch_one_sync, "SELECT * FROM applications WHERE id = ?", (app_id,))
-
-async def get_approved_unpublished_applications() -> List[Dict]:
-    return await run_in_executor(_db_fetch_all_sync, """
-        SELECT * FROM applications 
+    now = time.monotonic()
+    cached = application_cache.get(app_id)
+    if cached is not None and cached[0] > now:
+        return cached[1]
+    generation = application_cache_generation
+    row = await run_in_executor(_db_fetch_one_sync, "SELECT * FROM applications WHERE id = ?", (app_id,))
+    if row is not None and generation == application_cache_generation:
+        if len(application_cache) >= APPLICATION_CACHE_MAX_SIZE:
+            # Словарь хранит порядок вставки — выбрасываем самую старую запись
+            del application_cache[next(iter(application_cache))]
+        application_cache[app_id] = (now + APPLICATION_CACHE_TTL_SECONDS, row)
+    return row
+
+async def claim_due_applications() -> List[Dict]:
+    """Забирает в публикацию одобренные заявки, дата которых наступила.
+
+    Один UPDATE ... RETURNING переводит их в статус 'publishing', поэтому
+    одну и ту же заявку не заберут два параллельных запуска.
+    """
+    rows = await run_in_executor(_db_fetch_all_sync, """
+        UPDATE applications 
+        SET status = 'publishing' 
         WHERE status = 'approved' AND published_at IS NULL
-    """)
+          AND (publish_date IS NULL OR publish_date <= ?)
+        RETURNING id, text, photo_id, phone_number, original_link
+    """, (date.today().isoformat(),))
+    if rows:
+        invalidate_application_cache([row['id'] for row in rows])
+    return rows
+
+async def get_next_due_publish_date(today: str) -> Optional[str]:
+    row = await run_in_executor(_db_fetch_one_sync, """
+        SELECT MIN(publish_date) AS next_date 
+        FROM applications 
+        WHERE status = 'approved' AND published_at IS NULL AND publish_date > ?
+    """, (today,))
+    return row['next_date'] if row else None
+
+async def release_applications(app_ids: List[int]):
+    """Возвращает в очередь заявки, которые не удалось отправить."""
+    placeholders = ','.join('?' * len(app_ids))
+    await run_in_executor(_db_execute_sync, f"""
+        UPDATE applications SET status = 'approved' 
+        WHERE id IN ({placeholders}) AND status = 'publishing'
+    """, tuple(app_ids))
+    invalidate_application_cache(app_ids)
+    mark_publish_queue_dirty()
+
+def mark_publish_queue_dirty():
+    global publish_queue_dirty
+    publish_queue_dirty = True
+
+def invalidate_application_cache(app_ids: List[int]):
+    global application_cache_generation
+    application_cache_generation += 1
+    for app_id in app_ids:
+        application_cache.pop(app_id, None)
 
 async def update_application_status(app_id: int, status: str) -> bool:
+    # Решение принимается только по заявке на модерации; RETURNING сразу говорит, была ли она такой
     try:
-        await run_in_executor(
-            _db_execute_sync,
-            "UPDATE applications SET status = ? WHERE id = ?",
+        row = await run_in_executor(
+            _db_fetch_one_sync,
+            "UPDATE applications SET status = ? WHERE id = ? AND status = 'pending' RETURNING id",
             (status, app_id)
         )
+        if row is None:
+            return False
+        invalidate_application_cache([app_id])
+        if status == 'approved':
+            mark_publish_queue_dirty()
         return True
     except Exception as e:
-        logger.error(f"Ошибка обновления статуса заявки {app_id}: {e}")
+        logger.error("Ошибка обновления статуса заявки %s: %s", app_id, e)
         return False
 
-async def mark_application_as_published(app_id: int):
-    await run_in_executor(_db_execute_sync, """
+async def mark_applications_as_published(app_ids: List[int]):
+    # Один UPDATE на всю пачку: один проход по индексу и одна фиксация
+    placeholders = ','.join('?' * len(app_ids))
+    await run_in_executor(_db_execute_sync, f"""
         UPDATE applications 
         SET published_at = CURRENT_TIMESTAMP, status = 'published' 
-        WHERE id = ?
-    """, (app_id,))
+        WHERE id IN ({placeholders})
+    """, tuple(app_ids))
+    invalidate_application_cache(app_ids)
 
-async def can_submit_request(user_id: int) -> bool:
-    row = await run_in_executor(_db_fetch_one_sync, """
-        SELECT COUNT(*) as count 
+def can_submit_request(user_id: int) -> bool:
+    history = rate_limit_history.get(user_id)
+    if not history:
+        return True
+    cutoff = time.monotonic() - RATE_LIMIT_WINDOW_SECONDS
+    while history and history[0] < cutoff:
+        history.popleft()
+    if not history:
+        del rate_limit_history[user_id]
+        return True
+    return len(history) < RATE_LIMIT_MAX_REQUESTS
+
+async def prune_rate_limit_history():
+    # Пользователи, не подававшие заявок дольше окна, больше не занимают память
+    cutoff = time.monotonic() - RATE_LIMIT_WINDOW_SECONDS
+    stale_users = [user_id for user_id, history in rate_limit_history.items() if not history or history[-1] < cutoff]
+    for user_id in stale_users:
+        del rate_limit_history[user_id]
+    if stale_users:
+        logger.info("Очищена история частоты заявок для %s пользователей.", len(stale_users))
+
+async def load_rate_limit_history():
+    """Восстанавливает счётчики частоты заявок из БД после перезапуска."""
+    rows = await run_in_executor(_db_fetch_all_sync, """
+        SELECT user_id, created_at 
         FROM applications 
-        WHERE user_id = ? AND created_at > datetime('now', '-1 hour')
-    """, (user_id,))
-    return row['count'] < 5 if row else True
+        WHERE created_at > datetime('now', ?)
+        ORDER BY created_at
+    """, (f'-{RATE_LIMIT_WINDOW_SECONDS} seconds',))
+    now_utc = datetime.now(timezone.utc)
+    now_monotonic = time.monotonic()
+    for row in rows:
+        created_at = datetime.fromisoformat(row['created_at']).replace(tzinfo=timezone.utc)
+        rate_limit_history[row['user_id']].append(now_monotonic - (now_utc - created_at).total_seconds())
+    logger.info("Загружено %s недавних заявок для ограничения частоты.", len(rows))
 
 # ========== Вспомогательные функции ==========
+# Удаляется всё, кроме цифр и «+» (включая неразрывные пробелы и дефисы из контактов),
+# остаток сверяется со строгим шаблоном
+_PHONE_JUNK_RE = re.compile(r'[^\d+]', re.ASCII)
+_PHONE_RE = re.compile(r'(?:\+7|8)\d{10}', re.ASCII)
+# Даже с разделителями номер не длиннее этого; длинный ввод отбрасывается без очистки
+MAX_PHONE_INPUT_LENGTH = 40
+# Проверка длины встроена в квантификатор
+_NAME_RE = re.compile(rf'[a-zA-Zа-яА-ЯёЁ\s\'\"\-]{{2,{MAX_NAME_LENGTH}}}')
+
 def validate_name(name: str) -> bool:
-    return bool(re.match(r'^[a-zA-Zа-яА-ЯёЁ\s\'\"\-]+$', name)) and 2 <= len(name.strip()) <= MAX_NAME_LENGTH
+    return _NAME_RE.fullmatch(name.strip()) is not None
 
 def validate_phone(phone: str) -> bool:
-    clean_phone = re.sub(r'[^\d+]', '', phone)
-    return bool(re.match(r'^(\+7|8)\d{10}$', clean_phone))
+    if len(phone) > MAX_PHONE_INPUT_LENGTH:
+        return False
+    return _PHONE_RE.fullmatch(_PHONE_JUNK_RE.sub('', phone)) is not None
+
+def parse_date_ddmmyyyy(date_str: str) -> date:
+    """Разбирает дату ДД-ММ-ГГГГ без strptime; при ошибке — ValueError."""
+    day, month, year = date_str.split('-')
+    # Как у strptime('%d-%m-%Y'): день и месяц из 1–2 цифр, год ровно из 4
+    if not (date_str.isascii() and day.isdigit() and month.isdigit() and year.isdigit()
+            and len(day) <= 2 and len(month) <= 2 and len(year) == 4):
+        raise ValueError(f"Неверная дата: {date_str}")
+    return date(int(year), int(month), int(day))
+
+def _parse_bad_words(content: str) -> Set[str]:
+    return {word.strip().lower() for line in content.splitlines() for word in line.split(',') if word.strip()}
+
+_CYRILLIC_RE = re.compile('[а-яё]', re.IGNORECASE)
+
+def _trie_regex(words: Set[str]) -> str:
+    # Слова с общим префиксом сливаются в одну ветку: движок не перебирает альтернативы заново с каждой буквы
+    trie: Dict[str, dict] = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def build(node: Dict[str, dict]) -> str:
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        if '' not in node and len(branches) == 1:
+            return branches[0]
+        group = '(?:' + '|'.join(branches) + ')'
+        # Слово может закончиться здесь; жадный ? сначала пробует более длинное продолжение
+        return group + '?' if '' in node else group
+
+    return build(trie)
+
+def _set_bad_words(words: Set[str], mtime: Optional[float]):
+    global bad_words_cache, bad_words_pattern, bad_words_mtime, bad_words_min_length, bad_words_need_cyrillic
+    bad_words_cache = words
+    bad_words_mtime = mtime
+    if not words:
+        bad_words_pattern = None
+        bad_words_min_length = 0
+        bad_words_need_cyrillic = False
+        return
+    bad_words_min_length = min(len(word) for word in words)
+    # Если в каждом слове есть кириллица, текст только из ASCII совпасть не может
+    bad_words_need_cyrillic = all(_CYRILLIC_RE.search(word) for word in words)
+    # Одно регулярное выражение на весь список в виде префиксного дерева
+    bad_words_pattern = re.compile(rf'\b(?:{_trie_regex(words)})\b', re.IGNORECASE)
+
+def _read_bad_words_file() -> Tuple[Set[str], float]:
+    mtime = os.stat(BAD_WORDS_FILE).st_mtime
+    with open(BAD_WORDS_FILE, 'r', encoding='utf-8') as f:
+        return _parse_bad_words(f.read()), mtime
 
 async def load_bad_words():
-    global bad_words_cache
     try:
-        async with aiofiles.open(BAD_WORDS_FILE, 'r', encoding='utf-8') as f:
-            content = await f.read()
-        words = {word.strip().lower() for line in content.splitlines() for word in line.split(',') if word.strip()}
-        bad_words_cache = words
-        logger.info(f"Загружено {len(bad_words_cache)} запрещенных слов.")
+        words, mtime = await run_in_executor(_read_bad_words_file)
+        _set_bad_words(words, mtime)
+        logger.info("Загружено %s запрещенных слов.", len(bad_words_cache))
     except FileNotFoundError:
         logger.warning("Файл с запрещенными словами не найден. Используются значения по умолчанию.")
-        bad_words_cache = {word.lower() for word in DEFAULT_BAD_WORDS}
+        _set_bad_words({word.lower() for word in DEFAULT_BAD_WORDS}, None)
     except Exception as e:
-        logger.error(f"Ошибка загрузки bad_words.txt: {e}")
-        bad_words_cache = {word.lower() for word in DEFAULT_BAD_WORDS}
+        logger.error("Ошибка загрузки bad_words.txt: %s", e)
+        _set_bad_words({word.lower() for word in DEFAULT_BAD_WORDS}, None)
+
+def _read_bad_words_if_changed() -> Optional[Tuple[Set[str], float]]:
+    try:
+        mtime = os.stat(BAD_WORDS_FILE).st_mtime
+    except OSError:
+        return None
+    if mtime == bad_words_mtime:
+        return None
+    return _read_bad_words_file()
+
+async def refresh_bad_words():
+    # Файл проверяется по расписанию в пуле потоков, censor_text не делает ввода-вывода
+    try:
+        result = await run_in_executor(_read_bad_words_if_changed)
+    except Exception as e:
+        logger.error("Ошибка перечитывания bad_words.txt: %s", e)
+        return
+    if result is None:
+        return
+    _set_bad_words(*result)
+    logger.info("Список запрещенных слов обновлён: %s слов.", len(bad_words_cache))
+
+# Невидимые символы, которыми можно разбить запрещённое слово и обойти фильтр
+_ZERO_WIDTH_CHARS = str.maketrans('', '', '\u200b\u200c\u200d\u2060\ufeff')
 
 def censor_text(text: str) -> Tuple[str, bool]:
-    censored = text
-    has_bad = False
-    for word in bad_words_cache:
-        pattern = r'\b' + re.escape(word) + r'\b'
-        if re.search(pattern, censored, re.IGNORECASE):
-            has_bad = True
-            censored = re.sub(pattern, '***', censored, flags=re.IGNORECASE)
-    return censored, has_bad
+    # Невидимые символы убираются только из копии для поиска: U+200D входит в составные эмодзи,
+    # поэтому текст без запрещённых слов возвращается как есть
+    if bad_words_pattern is None or len(text) < bad_words_min_length:
+        return text, False
+    if bad_words_need_cyrillic and text.isascii():
+        return text, False
+    censored, count = bad_words_pattern.subn('***', text.translate(_ZERO_WIDTH_CHARS))
+    if count == 0:
+        return text, False
+    return censored, True
 
 # ========== Безопасные обертки для отправки сообщений ==========
 async def safe_reply_text(update: Update, text: str, **kwargs):
@@ -306,42 +738,42 @@ async def safe_reply_text(update: Update, text: str, **kwargs):
         elif update.message:
             await update.message.reply_text(text=text, **kwargs)
     except Exception as e:
-        logger.error(f"Ошибка отправки сообщения: {e}")
+        logger.error("Ошибка отправки сообщения: %s", e)
 
 async def safe_edit_message_text(query, text: str, **kwargs):
     try:
         await query.edit_message_text(text=text, **kwargs)
     except Exception as e:
         if "message is not modified" not in str(e).lower():
-            logger.warning(f"Ошибка редактирования сообщения: {e}")
+            logger.warning("Ошибка редактирования сообщения: %s", e)
+
+async def send_to_chat(bot: Bot, chat_id, text: str, photo_id: Optional[str] = None,
+                       reply_markup: Optional[InlineKeyboardMarkup] = None):
+    # Заявка с фото уходит фото с подписью, без фото — текстом; ошибки передаются вызывающему
+    if photo_id:
+        return await bot.send_photo(
+            chat_id=chat_id,
+            photo=photo_id,
+            caption=text,
+            reply_markup=reply_markup,
+            parse_mode="HTML"
+        )
+    return await bot.send_message(
+        chat_id=chat_id,
+        text=text,
+        reply_markup=reply_markup,
+        parse_mode="HTML"
+    )
 
 # ========== Основные обработчики команд ==========
 
 async def start_command(update: Update, context: CallbackContext) -> int:
     """Обработчик команды /start — улучшенное приветственное сообщение."""
     context.user_data.clear()
-
-    welcome_text = (
-        "👋 *Добро пожаловать в бот канала «Что почем? Николаевск»!* 🛒\n\n"
-        "Здесь вы можете:\n"
-        "🎉 *Поздравить* кого-то с праздником\n"
-        "🚗 *Оставить попутку*\n"
-        "📢 *Разместить объявление* (работа, потеря, услуга)\n\n"
-        "Выберите, что хотите сделать:"
-    )
-
-    keyboard = [
-        [InlineKeyboardButton("🚗 Попутка", callback_data="carpool")],
-        [InlineKeyboardButton(f"🎉 Поздравление", callback_data="congrat")],
-        [InlineKeyboardButton(f"📢 Объявление", callback_data="announcement")],
-        [InlineKeyboardButton(f"🗞️ Новость от жителя", callback_data="news")],
-        [InlineKeyboardButton("ℹ️ Как это работает?", callback_data="help_inline")]
-    ]
-
     await safe_reply_text(
         update,
-        welcome_text,
-        reply_markup=InlineKeyboardMarkup(keyboard),
+        WELCOME_TEXT,
+        reply_markup=START_KEYBOARD,
         parse_mode="Markdown"
     )
     return TYPE_SELECTION
@@ -362,12 +794,10 @@ async def help_inline_handler(update: Update, context: CallbackContext) -> int:
         "👉 Нажмите *«Вернуться»*, чтобы выбрать действие."
     )
 
-    keyboard = [[InlineKeyboardButton("🔙 Вернуться", callback_data="back_to_start")]]
-    
     await safe_edit_message_text(
         query,
         help_text,
-        reply_markup=InlineKeyboardMarkup(keyboard),
+        reply_markup=HELP_KEYBOARD,
         parse_mode="Markdown"
     )
     return TYPE_SELECTION
@@ -378,7 +808,7 @@ async def cancel_command(update: Update, context: CallbackContext) -> int:
     return ConversationHandler.END
 
 async def back_to_start(update: Update, context: CallbackContext) -> int:
-    await context.bot.answer_callback_query(update.callback_query.id)
+    # На callback отвечает safe_reply_text внутри start_command — второй answer не нужен
     return await start_command(update, context)
 
 async def handle_any_photo(update: Update, context: CallbackContext) -> None:
@@ -392,15 +822,10 @@ async def handle_carpool_start(update: Update, context: CallbackContext) -> int:
     await query.answer()
     context.user_data["type"] = "announcement"
     context.user_data["subtype"] = "ride"
-    keyboard = [
-        [InlineKeyboardButton("Ищу попутчиков", callback_data="carpool_need")],
-        [InlineKeyboardButton("Предлагаю поездку", callback_data="carpool_offer")],
-        [InlineKeyboardButton("🔙 Вернуться в начало", callback_data="back_to_start")]
-    ]
     await safe_edit_message_text(
         query,
         "🚗 Здесь вы можете оставить попутку!\n\nВыберите тип поездки:\n— «Ищу попутчиков» (если хотите найти компанию для поездки)\n— «Предлагаю поездку» (если есть свободные места в машине)",
-        reply_markup=InlineKeyboardMarkup(keyboard)
+        reply_markup=CARPOOL_TYPE_KEYBOARD
     )
     return CARPOOL_SUBTYPE_SELECTION
 
@@ -411,7 +836,7 @@ async def handle_carpool_type(update: Update, context: CallbackContext) -> int:
     await safe_edit_message_text(
         query,
         "Откуда планируете поездку? (Например: Николаевск):",
-        reply_markup=InlineKeyboardMarkup(BACK_BUTTON)
+        reply_markup=BACK_KEYBOARD
     )
     return RIDE_FROM_INPUT
 
@@ -420,7 +845,7 @@ async def handle_carpool_from(update: Update, context: CallbackContext) -> int:
     await safe_reply_text(
         update,
         "Куда направляетесь? (Например: Хабаровск):",
-        reply_markup=InlineKeyboardMarkup(BACK_BUTTON)
+        reply_markup=BACK_KEYBOARD
     )
     return RIDE_TO_INPUT
 
@@ -429,7 +854,7 @@ async def handle_carpool_to(update: Update, context: CallbackContext) -> int:
     await safe_reply_text(
         update,
         "Когда планируете выезд? (Например: 15.08 в 10:00):",
-        reply_markup=InlineKeyboardMarkup(BACK_BUTTON)
+        reply_markup=BACK_KEYBOARD
     )
     return RIDE_DATE_INPUT
 
@@ -438,7 +863,7 @@ async def handle_carpool_date(update: Update, context: CallbackContext) -> int:
     await safe_reply_text(
         update,
         "Сколько мест доступно? (Введите число):",
-        reply_markup=InlineKeyboardMarkup(BACK_BUTTON)
+        reply_markup=BACK_KEYBOARD
     )
     return RIDE_SEATS_INPUT
 
@@ -447,7 +872,7 @@ async def handle_carpool_seats(update: Update, context: CallbackContext) -> int:
     await safe_reply_text(
         update,
         "Введите ваш контактный телефон (формат: +7... или 8...):",
-        reply_markup=InlineKeyboardMarkup(BACK_BUTTON)
+        reply_markup=BACK_KEYBOARD
     )
     return RIDE_PHONE_INPUT
 
@@ -456,31 +881,19 @@ async def handle_carpool_phone(update: Update, context: CallbackContext) -> int:
     if not validate_phone(phone):
         await safe_reply_text(update, "Введите корректный номер телефона (например: +79610904569).")
         return RIDE_PHONE_INPUT
-    if not await can_submit_request(update.effective_user.id):
+    if not can_submit_request(update.effective_user.id):
         await safe_reply_text(update, "❌ Слишком много запросов. Попробуйте позже.")
         return ConversationHandler.END
     context.user_data["phone_number"] = phone
     ride_data = context.user_data
-    text = (
-        f"🚗 <b>{ride_data['ride_type']}</b>\n"
-        f"📍 <b>Откуда:</b> {ride_data['ride_from']}\n"
-        f"📍 <b>Куда:</b> {ride_data['ride_to']}\n"
-        f"⏰ <b>Время:</b> {ride_data['ride_date']}\n"
-        f"🪑 <b>Мест:</b> {ride_data['ride_seats']}\n"
-        f"📞 <b>Телефон:</b> {phone}\n"
-        f"#ЧтоПочёмНиколаевск"
-    )
+    text = RIDE_POST_TEMPLATE.format_map(ride_data)
     censored_text, has_bad = censor_text(text)
     if has_bad:
         context.user_data["censored_text"] = censored_text
-        keyboard = [
-            [InlineKeyboardButton("✅ Отправить", callback_data="accept_censor")],
-            [InlineKeyboardButton("✏️ Изменить", callback_data="edit_censor")]
-        ]
         await safe_reply_text(
             update,
             f"⚠️ Обнаружены запрещённые слова:\n{censored_text}\nПодтвердите отправку:",
-            reply_markup=InlineKeyboardMarkup(keyboard)
+            reply_markup=CENSOR_KEYBOARD
         )
         return WAIT_CENSOR_APPROVAL
     try:
@@ -501,24 +914,29 @@ async def handle_carpool_phone(update: Update, context: CallbackContext) -> int:
         if AUTO_PUBLISH_CARPOOL:
             app_id = await add_application(app_data)
             if app_id:
-                success = await publish_to_channel(app_id, context.bot)
+                success = await publish_to_channel(app_id, publisher_bot)
                 if success:
                     await safe_reply_text(update, f"✅ Попутка сразу опубликована в канал!")
-                    logger.info(f"Попутка #{app_id} опубликована без модерации.")
+                    logger.info("Попутка #%s опубликована без модерации.", app_id)
                 else:
-                    await safe_reply_text(update, "❌ Ошибка публикации. Заявка отправлена на модерацию.")
-                    await notify_admin_new_application(context.bot, app_id)
+                    await asyncio.gather(
+                        safe_reply_text(update, "❌ Ошибка публикации. Заявка отправлена на модерацию."),
+                        notify_admin_new_application(context.bot, app_id)
+                    )
             else:
                 await safe_reply_text(update, "❌ Ошибка при создании заявки.")
         else:
             app_id = await add_application(app_data)
             if app_id:
-                await notify_admin_new_application(context.bot, app_id)
-                await safe_reply_text(update, f"✅ Заявка #{app_id} отправлена на модерацию.")
+                # Уведомление админу и ответ пользователю независимы — отправляем одновременно
+                await asyncio.gather(
+                    notify_admin_new_application(context.bot, app_id),
+                    safe_reply_text(update, f"✅ Заявка #{app_id} отправлена на модерацию.")
+                )
             else:
                 await safe_reply_text(update, "❌ Ошибка при создании заявки.")
     except Exception as e:
-        logger.error(f"Ошибка публикации попутки: {e}")
+        logger.error("Ошибка публикации попутки: %s", e)
         await safe_reply_text(update, "❌ Не удалось опубликовать. Попробуйте позже.")
     context.user_data.clear()
     return ConversationHandler.END
@@ -533,26 +951,22 @@ async def handle_type_selection(update: Update, context: CallbackContext) -> int
         await safe_edit_message_text(
             query,
             "📰 Новость от жителя\n\nЗдесь можно поделиться важной информацией о жизни города: события, происшествия, интересные факты.\n\nВведите ваш контактный телефон (формат: +7... или 8...), чтобы мы могли уточнить детали при необходимости.",
-            reply_markup=InlineKeyboardMarkup(BACK_BUTTON)
+            reply_markup=BACK_KEYBOARD
         )
         return NEWS_PHONE_INPUT
     elif request_type == "congrat":
         await safe_edit_message_text(
             query,
-            f"🎉 Вы собираетесь отправить поздравление!\n\nУкажите своё имя, чтобы подписать поздравление (например: *{EXAMPLE_TEXTS['sender_name']}*).",
-            reply_markup=InlineKeyboardMarkup(BACK_BUTTON),
+            SENDER_NAME_PROMPT,
+            reply_markup=BACK_KEYBOARD,
             parse_mode="Markdown"
         )
         return SENDER_NAME_INPUT
     elif request_type == "announcement":
-        keyboard = [
-            [InlineKeyboardButton(subtype, callback_data=f"subtype_{key}")]
-            for key, subtype in ANNOUNCE_SUBTYPES.items()
-        ] + BACK_BUTTON
         await safe_edit_message_text(
             query,
             "📢 Размещение объявления\n\nЗдесь можно:\n— Разместить предложение/спрос (работа, услуги, товары)\n— Сообщить о потерях и находках\n\nВыберите подходящий тип объявления:",
-            reply_markup=InlineKeyboardMarkup(keyboard)
+            reply_markup=ANNOUNCE_SUBTYPE_KEYBOARD
         )
         return ANNOUNCE_SUBTYPE_SELECTION
     return ConversationHandler.END
@@ -560,12 +974,12 @@ async def handle_type_selection(update: Update, context: CallbackContext) -> int
 async def get_sender_name(update: Update, context: CallbackContext) -> int:
     sender_name = update.message.text.strip()
     if not validate_name(sender_name):
-        await safe_reply_text(update, f"Пожалуйста, введите корректное имя (от 2 до {MAX_NAME_LENGTH} символов).")
+        await safe_reply_text(update, INVALID_NAME_MESSAGE)
         return SENDER_NAME_INPUT
     context.user_data["from_name"] = sender_name
     await safe_reply_text(
         update,
-        f"🎉 Отлично! Теперь укажите, кого поздравляете.\n\nНапример: *{EXAMPLE_TEXTS['recipient_name']}*.\nМожно написать имя человека, группу или организацию.",
+        RECIPIENT_NAME_PROMPT,
         parse_mode="Markdown"
     )
     return RECIPIENT_NAME_INPUT
@@ -573,20 +987,13 @@ async def get_sender_name(update: Update, context: CallbackContext) -> int:
 async def get_recipient_name(update: Update, context: CallbackContext) -> int:
     recipient_name = update.message.text.strip()
     if not validate_name(recipient_name):
-        await safe_reply_text(update, f"Пожалуйста, введите корректное имя (от 2 до {MAX_NAME_LENGTH} символов).")
+        await safe_reply_text(update, INVALID_NAME_MESSAGE)
         return RECIPIENT_NAME_INPUT
     context.user_data["to_name"] = recipient_name
-    keyboard = [
-        [InlineKeyboardButton(holiday, callback_data=f"holiday_{holiday}")]
-        for holiday in HOLIDAYS
-    ] + [
-        [InlineKeyboardButton("🎉 Другой праздник", callback_data="custom_congrat")],
-        [InlineKeyboardButton("🔙 Вернуться в начало", callback_data="back_to_start")]
-    ]
     await safe_reply_text(
         update, 
         "Выберите праздник из списка или укажите свой:", 
-        reply_markup=InlineKeyboardMarkup(keyboard)
+        reply_markup=HOLIDAY_KEYBOARD
     )
     return CONGRAT_HOLIDAY_CHOICE
 
@@ -597,28 +1004,23 @@ async def handle_congrat_holiday_choice(update: Update, context: CallbackContext
         context.user_data["congrat_type"] = "custom"
         await safe_edit_message_text(
             query, 
-            f"Напишите своё поздравление (до {MAX_CONGRAT_TEXT_LENGTH} символов):", 
-            reply_markup=InlineKeyboardMarkup(BACK_BUTTON)
+            CUSTOM_CONGRAT_PROMPT,
+            reply_markup=BACK_KEYBOARD
         )
         return CUSTOM_CONGRAT_MESSAGE_INPUT
-    holiday = query.data.replace("holiday_", "")
-    if holiday not in HOLIDAYS:
+    holiday = CALLBACK_TO_HOLIDAY.get(query.data)
+    if holiday is None:
         await safe_edit_message_text(query, "❌ Неизвестный праздник. Пожалуйста, выберите из списка.")
         return ConversationHandler.END
-    template = HOLIDAY_TEMPLATES.get(holiday, "С праздником!")
-    from_name = context.user_data.get("from_name", "")
-    to_name = context.user_data.get("to_name", "")
-    context.user_data["text"] = f"{from_name} поздравляет {to_name} с {holiday}! {template}"
+    context.user_data["text"] = HOLIDAY_CONGRAT_TEXTS[holiday].format(
+        from_name=context.user_data.get("from_name", ""),
+        to_name=context.user_data.get("to_name", "")
+    )
     context.user_data["congrat_type"] = "standard"
-    keyboard = [
-        [InlineKeyboardButton("📅 Сегодня", callback_data="publish_today")],
-        [InlineKeyboardButton("📆 Указать дату", callback_data="publish_custom_date")],
-        [InlineKeyboardButton("🔙 Вернуться в начало", callback_data="back_to_start")]
-    ]
     await safe_edit_message_text(
         query, 
         "Когда опубликовать поздравление?", 
-        reply_markup=InlineKeyboardMarkup(keyboard)
+        reply_markup=PUBLISH_DATE_KEYBOARD
     )
     return CONGRAT_DATE_CHOICE
 
@@ -626,13 +1028,13 @@ async def handle_congrat_date_choice(update: Update, context: CallbackContext) -
     query = update.callback_query
     await query.answer()
     if query.data == "publish_today":
-        context.user_data["publish_date"] = datetime.now().strftime("%Y-%m-%d")
+        context.user_data["publish_date"] = date.today().isoformat()
         return await complete_request(update, context)
     elif query.data == "publish_custom_date":
         await safe_edit_message_text(
             query, 
             "Введите дату публикации в формате ДД-ММ-ГГГГ:", 
-            reply_markup=InlineKeyboardMarkup(BACK_BUTTON)
+            reply_markup=BACK_KEYBOARD
         )
         return CONGRAT_DATE_INPUT
     return ConversationHandler.END
@@ -640,11 +1042,11 @@ async def handle_congrat_date_choice(update: Update, context: CallbackContext) -
 async def get_congrat_date(update: Update, context: CallbackContext) -> int:
     date_str = update.message.text.strip()
     try:
-        publish_date = datetime.strptime(date_str, "%d-%m-%Y").date()
+        publish_date = parse_date_ddmmyyyy(date_str)
         if publish_date < datetime.now().date():
             await safe_reply_text(update, "Нельзя указать прошедшую дату.")
             return CONGRAT_DATE_INPUT
-        context.user_data["publish_date"] = publish_date.strftime("%Y-%m-%d")
+        context.user_data["publish_date"] = publish_date.isoformat()
         return await complete_request(update, context)
     except ValueError:
         await safe_reply_text(update, "Неверный формат даты. Используйте ДД-ММ-ГГГГ.")
@@ -664,15 +1066,10 @@ async def get_custom_congrat_message(update: Update, context: CallbackContext) -
     to_name = context.user_data.get("to_name", "")
     context.user_data["text"] = f"{from_name} поздравляет {to_name}! {text}"
     context.user_data["congrat_type"] = "custom"
-    keyboard = [
-        [InlineKeyboardButton("📅 Сегодня", callback_data="publish_today")],
-        [InlineKeyboardButton("📆 Указать дату", callback_data="publish_custom_date")],
-        [InlineKeyboardButton("🔙 Вернуться в начало", callback_data="back_to_start")]
-    ]
     await safe_reply_text(
         update, 
         "Когда опубликовать поздравление?", 
-        reply_markup=InlineKeyboardMarkup(keyboard)
+        reply_markup=PUBLISH_DATE_KEYBOARD
     )
     return CONGRAT_DATE_CHOICE
 
@@ -680,13 +1077,15 @@ async def get_custom_congrat_message(update: Update, context: CallbackContext) -
 async def handle_announce_subtype_selection(update: Update, context: CallbackContext) -> int:
     query = update.callback_query
     await query.answer()
-    subtype_key = query.data.replace("subtype_", "")
+    subtype_key = CALLBACK_TO_SUBTYPE.get(query.data)
+    if subtype_key is None:
+        await safe_edit_message_text(query, "❌ Неизвестный тип объявления. Пожалуйста, выберите из списка.")
+        return ConversationHandler.END
     context.user_data["subtype"] = subtype_key
-    example = EXAMPLE_TEXTS["announcement"].get(subtype_key, "")
     await safe_edit_message_text(
         query,
-        f"Введите текст объявления (до {MAX_TEXT_LENGTH} символов).\nПример: {example}",
-        reply_markup=InlineKeyboardMarkup(BACK_BUTTON)
+        ANNOUNCE_TEXT_PROMPTS[subtype_key],
+        reply_markup=BACK_KEYBOARD
     )
     return ANNOUNCE_TEXT_INPUT
 
@@ -704,14 +1103,10 @@ async def handle_announce_text_input(update: Update, context: CallbackContext) -
     censored_text, has_bad = censor_text(text)
     if has_bad:
         context.user_data["censored_text"] = censored_text
-        keyboard = [
-            [InlineKeyboardButton("✅ Принять и отправить", callback_data="accept_censor")],
-            [InlineKeyboardButton("✏️ Изменить текст", callback_data="edit_censor")]
-        ]
         await safe_reply_text(
             update,
             f"⚠️ В тексте найдены запрещённые слова (заменены на ***):\n{censored_text}\nПодтвердите или измените текст:",
-            reply_markup=InlineKeyboardMarkup(keyboard)
+            reply_markup=CENSOR_EDIT_TEXT_KEYBOARD
         )
         return WAIT_CENSOR_APPROVAL
     context.user_data["text"] = censored_text
@@ -725,11 +1120,7 @@ async def get_news_phone_number(update: Update, context: CallbackContext) -> int
         await safe_reply_text(update, "Неверный формат номера. Используйте +7... или 8...")
         return NEWS_PHONE_INPUT
     context.user_data["phone_number"] = phone
-    await safe_reply_text(
-        update,
-        "📰 Коротко опишите, что произошло, где и когда. При необходимости можно прикрепить фото.\n\n"
-        f"Введите текст новости (до {MAX_ANNOUNCE_NEWS_TEXT_LENGTH} символов):"
-    )
+    await safe_reply_text(update, NEWS_TEXT_PROMPT)
     return NEWS_TEXT_INPUT
 
 async def get_news_text(update: Update, context: CallbackContext) -> int:
@@ -745,14 +1136,10 @@ async def get_news_text(update: Update, context: CallbackContext) -> int:
     censored_text, has_bad = censor_text(text)
     if has_bad:
         context.user_data["censored_text"] = censored_text
-        keyboard = [
-            [InlineKeyboardButton("✅ Отправить", callback_data="accept_censor")],
-            [InlineKeyboardButton("✏️ Изменить", callback_data="edit_censor")]
-        ]
         await safe_reply_text(
             update,
             f"⚠️ В тексте найдены запрещённые слова:\n{censored_text}\nПодтвердите отправку:",
-            reply_markup=InlineKeyboardMarkup(keyboard)
+            reply_markup=CENSOR_KEYBOARD
         )
         return WAIT_CENSOR_APPROVAL
     context.user_data["text"] = censored_text
@@ -771,18 +1158,20 @@ async def get_news_text(update: Update, context: CallbackContext) -> int:
 
     app_id = await add_application(app_data)
     if app_id:
-        await notify_admin_new_application(context.bot, app_id)
         confirmation_text = (
             "✅ Новость принята.\n\n"
             "После проверки она будет опубликована в канале:\n"
             f"<a href='{NEWS_CHANNEL_LINK}'>{NEWS_CHANNEL_TEXT}</a>\n\n"
             "📰 Здесь вы можете ознакомиться с новостями нашего городка."
         )
-        await safe_reply_text(
-            update,
-            confirmation_text,
-            parse_mode="HTML",
-            disable_web_page_preview=True
+        await asyncio.gather(
+            notify_admin_new_application(context.bot, app_id),
+            safe_reply_text(
+                update,
+                confirmation_text,
+                parse_mode="HTML",
+                disable_web_page_preview=True
+            )
         )
     else:
         await safe_reply_text(update, "❌ Ошибка при создании заявки.")
@@ -813,7 +1202,7 @@ async def handle_censor_choice(update: Update, context: CallbackContext) -> int:
         await safe_edit_message_text(
             query, 
             "Введите исправленный текст:", 
-            reply_markup=InlineKeyboardMarkup(BACK_BUTTON)
+            reply_markup=BACK_KEYBOARD
         )
         request_type = context.user_data.get("type")
         if request_type == "congrat":
@@ -827,7 +1216,7 @@ async def handle_censor_choice(update: Update, context: CallbackContext) -> int:
 # ========== Завершение заявки ==========
 async def complete_request(update: Update, context: CallbackContext) -> int:
     user = update.effective_user
-    if not await can_submit_request(user.id):
+    if not can_submit_request(user.id):
         await safe_reply_text(update, "Вы отправили слишком много заявок. Попробуйте позже.")
         return ConversationHandler.END
     user_data = context.user_data
@@ -851,11 +1240,12 @@ async def complete_request(update: Update, context: CallbackContext) -> int:
     }
     app_id = await add_application(app_data)
     if app_id:
+        sends = [safe_reply_text(update, f"✅ Заявка #{app_id} отправлена на модерацию.")]
         if ADMIN_CHAT_ID:
-            await notify_admin_new_application(context.bot, app_id)
+            sends.append(notify_admin_new_application(context.bot, app_id))
         else:
             logger.warning("ADMIN_CHAT_ID не задан. Уведомление администратору не отправлено.")
-        await safe_reply_text(update, f"✅ Заявка #{app_id} отправлена на модерацию.")
+        await asyncio.gather(*sends)
     else:
         await safe_reply_text(update, "❌ Ошибка при создании заявки.")
     context.user_data.clear()
@@ -865,88 +1255,65 @@ async def complete_request(update: Update, context: CallbackContext) -> int:
 async def notify_admin_new_application(bot: Bot, app_id: int):
     app_data = await get_application_details(app_id)
     if not app_data:
-        logger.error(f"Не удалось получить данные для заявки #{app_id} для отправки админу.")
+        logger.error("Не удалось получить данные для заявки #%s для отправки админу.", app_id)
         return
     try:
-        app_type = REQUEST_TYPES.get(app_data['type'], {}).get('name', 'Заявка')
-        subtype = ANNOUNCE_SUBTYPES.get(app_data['subtype'], '') if app_data.get('subtype') else ''
-        full_type = f"{app_type}" + (f" ({subtype})" if subtype else '')
-        phone = f"• Телефон: {app_data['phone_number']}" if app_data.get('phone_number') else ""
-        has_photo = "✅" if app_data.get('photo_id') else "❌"
-        caption = f"""📨 Новая заявка #{app_id}
-• Тип: {full_type}
-• Фото: {has_photo}
-{phone}
-• От: @{app_data.get('username') or 'N/A'} (ID: {app_data['user_id']})
-• Текст: {app_data['text']}"""
-        keyboard = None
-        if app_data['type'] != "news":
-            keyboard = InlineKeyboardMarkup([
-                [InlineKeyboardButton("✅ Одобрить", callback_data=f"approve_{app_id}"),
-                 InlineKeyboardButton("❌ Отклонить", callback_data=f"reject_{app_id}")]
-            ])
-        if app_data.get('photo_id'):
-            await bot.send_photo(
-                chat_id=ADMIN_CHAT_ID,
-                photo=app_data['photo_id'],
-                caption=caption,
-                reply_markup=keyboard,
-                parse_mode="HTML"
-            )
-        else:
-            await bot.send_message(
-                chat_id=ADMIN_CHAT_ID,
-                text=caption,
-                reply_markup=keyboard,
-                parse_mode="HTML"
-            )
-        logger.info(f"Заявка #{app_id} отправлена администратору.")
+        app_type = TYPE_NAME_BY_KEY.get(app_data['type'], 'Заявка')
+        subtype = ANNOUNCE_SUBTYPES.get(app_data.get('subtype'), '')
+        caption = ADMIN_CAPTION_TEMPLATE.format_map({
+            'app_id': app_id,
+            'full_type': f"{app_type} ({subtype})" if subtype else app_type,
+            'has_photo': "✅" if app_data.get('photo_id') else "❌",
+            'phone': f"• Телефон: {app_data['phone_number']}" if app_data.get('phone_number') else "",
+            'username': app_data.get('username') or 'N/A',
+            'user_id': app_data['user_id'],
+            'text': app_data['text']
+        })
+        keyboard = moderation_keyboard(app_id) if app_data['type'] != "news" else None
+        await send_to_chat(bot, ADMIN_CHAT_ID, caption, app_data.get('photo_id'), keyboard)
+        logger.info("Заявка #%s отправлена администратору.", app_id)
     except Exception as e:
-        logger.error(f"Ошибка отправки заявки #{app_id} администратору: {e}", exc_info=True)
+        logger.error("Ошибка отправки заявки #%s администратору: %s", app_id, e, exc_info=True)
 
 # ========== Публикация в канал ==========
+async def send_to_channel(app_data: Dict, bot: Bot):
+    current_time = datetime.now(TIMEZONE).strftime("%H:%M")
+    parts = [app_data['text']]
+    phone = app_data.get('phone_number')
+    if phone:
+        parts.append(f"📞 Телефон: {phone}")
+
+    # Добавляем ссылку на оригинал, если есть
+    if app_data.get('original_link'):
+        parts.append(f"🔗 Перейти к объявлению ({app_data['original_link']})")
+
+    # Добавляем ссылку на новостной канал под каждым сообщением
+    parts += ["", NEWS_CHANNEL_FOOTER, CHANNEL_HASHTAG, f"🕒 {current_time}"]
+    message_text = "\n".join(parts)
+    await send_to_chat(bot, CHANNEL_ID, message_text, app_data.get('photo_id'))
+
 async def publish_to_channel(app_id: int, bot: Bot):
     app_data = await get_application_details(app_id)
     if not app_data:
-        logger.error(f"Не удалось получить данные для публикации заявки #{app_id}.")
+        logger.error("Не удалось получить данные для публикации заявки #%s.", app_id)
         return False
     try:
-        current_time = datetime.now(TIMEZONE).strftime("%H:%M")
-        text = app_data['text']
-        phone = app_data.get('phone_number')
-        if phone:
-            text += f"\n📞 Телефон: {phone}"
-
-        # Добавляем ссылку на оригинал, если есть
-        if app_data.get('original_link'):
-            text += f"\n🔗 Перейти к объявлению ({app_data['original_link']})"
-
-        # Добавляем ссылку на новостной канал под каждым сообщением
-        message_text = (
-            f"{text}\n\n"
-            f"📰 <a href='{NEWS_CHANNEL_LINK}'>Новости нашего городка — {NEWS_CHANNEL_TEXT}</a>\n"
-            f"#ЧтоПочёмНиколаевск\n"
-            f"🕒 {current_time}"
-        )
-
-        if app_data.get('photo_id'):
-            await bot.send_photo(
-                chat_id=CHANNEL_ID,
-                photo=app_data['photo_id'],
-                caption=message_text,
-                parse_mode="HTML"
-            )
-        else:
-            await bot.send_message(
-                chat_id=CHANNEL_ID,
-                text=message_text,
-                parse_mode="HTML"
-            )
-        await mark_application_as_published(app_id)
-        logger.info(f"Заявка #{app_id} опубликована в канале.")
+        # Обработчик диалога не ждёт очередь публикаций и паузу после 429 дольше PUBLISH_SLOT_WAIT_SECONDS
+        await asyncio.wait_for(wait_publish_slot(), timeout=PUBLISH_SLOT_WAIT_SECONDS)
+    except asyncio.TimeoutError:
+        logger.warning("Заявка #%s не опубликована сразу: нет свободного слота отправки в канал.", app_id)
+        return False
+    try:
+        await send_to_channel(app_data, bot)
+        await mark_applications_as_published([app_id])
+        logger.info("Заявка #%s опубликована в канале.", app_id)
         return True
+    except RetryAfter as e:
+        postpone_publishing(e.retry_after)
+        logger.warning("Заявка #%s не опубликована: лимит Telegram, пауза %s с.", app_id, e.retry_after)
+        return False
     except Exception as e:
-        logger.error(f"Ошибка публикации заявки #{app_id}: {e}")
+        logger.error("Ошибка публикации заявки #%s: %s", app_id, e)
         return False
 
 # ========== Админские функции ==========
@@ -955,6 +1322,7 @@ async def admin_approve_application(update: Update, context: CallbackContext):
     await query.answer()
     app_id = int(query.data.split('_')[1])
     if await update_application_status(app_id, 'approved'):
+        request_publish_check()
         await safe_edit_message_text(
             query,
             f"✅ Заявка #{app_id} одобрена!",
@@ -985,35 +1353,97 @@ async def admin_reject_application(update: Update, context: CallbackContext):
         )
 
 # ========== Проверка и публикация отложенных заявок ==========
+async def wait_publish_slot():
+    # Отправки стартуют с шагом PUBLISH_INTERVAL_SECONDS, но ответа предыдущей не ждут.
+    # Момент проверяется заново после каждого пробуждения, поэтому пауза из-за 429
+    # задерживает и отправку, которая уже ждёт
+    global next_publish_at
+    loop = asyncio.get_running_loop()
+    async with publish_slot_lock:
+        while True:
+            now = loop.time()
+            if next_publish_at <= now:
+                next_publish_at = now + PUBLISH_INTERVAL_SECONDS
+                return
+            await asyncio.sleep(next_publish_at - now)
+
+def postpone_publishing(retry_after: float):
+    # Telegram ответил 429: до истечения retry_after в канал ничего не отправляем
+    global next_publish_at
+    next_publish_at = max(next_publish_at, asyncio.get_running_loop().time() + retry_after)
+
+def request_publish_check():
+    # Одобренная заявка публикуется сразу, а не на следующем запуске задачи раз в минуту;
+    # если проверка уже идёт, заявку заберёт следующий запуск — очередь помечена изменённой
+    if scheduler:
+        scheduler.modify_job('publish_approved', next_run_time=datetime.now(TIMEZONE))
+
+async def publish_pending_application(app: Dict, bot: Bot, semaphore: asyncio.Semaphore) -> bool:
+    try:
+        async with semaphore:
+            await wait_publish_slot()
+            await send_to_channel(app, bot)
+            logger.info("Опубликовано сообщение #%s", app['id'])
+        return True
+    except RetryAfter as e:
+        postpone_publishing(e.retry_after)
+        logger.warning("Заявка #%s не опубликована: лимит Telegram, пауза %s с.", app['id'], e.retry_after)
+        return False
+    except Exception as e:
+        logger.error("Ошибка обработки заявки #%s: %s", app['id'], e)
+        return False
+
 async def check_pending_applications():
+    global publish_queue_dirty, next_due_publish_date
     try:
-        applications = await get_approved_unpublished_applications()
+        # Сначала проверяем готовность бота: забранные заявки должны быть отправлены или возвращены
+        if not application_ready.is_set():
+            return
+        # Без новых одобрений и до ближайшей даты публикации база не опрашивается
+        today = date.today().isoformat()
+        if not publish_queue_dirty and (next_due_publish_date is None or next_due_publish_date > today):
+            return
+        publish_queue_dirty = False
+        next_due_publish_date = await get_next_due_publish_date(today)
+        applications = await claim_due_applications()
         if not applications:
             return
-        bot = Bot(token=TOKEN)
-        for app in applications:
-            try:
-                if app['publish_date'] and datetime.strptime(app['publish_date'], "%Y-%m-%d").date() > datetime.now().date():
-                    continue
-                await publish_to_channel(app['id'], bot)
-                logger.info(f"Опубликовано сообщение #{app['id']}")
-                await asyncio.sleep(1)
-            except Exception as e:
-                logger.error(f"Ошибка обработки заявки #{app['id']}: {e}")
+        # Отправки идут параллельно, но не больше PUBLISH_CONCURRENCY одновременно
+        semaphore = asyncio.Semaphore(PUBLISH_CONCURRENCY)
+        results = await asyncio.gather(
+            *(publish_pending_application(app, publisher_bot, semaphore) for app in applications)
+        )
+        published_ids = [app['id'] for app, published in zip(applications, results) if published]
+        failed_ids = [app['id'] for app, published in zip(applications, results) if not published]
+        if published_ids:
+            await mark_applications_as_published(published_ids)
+        if failed_ids:
+            await release_applications(failed_ids)
     except Exception as e:
-        logger.error(f"Ошибка проверки заявок: {e}")
+        publish_queue_dirty = True
+        logger.error("Ошибка проверки заявок: %s", e)
 
 # ========== Инициализация бота ==========
 async def initialize_bot():
-    global application
+    global application, publisher_bot
     async with application_lock:
-        if application is not None:
+        if application_ready.is_set():
             return
-        application = Application.builder().token(TOKEN).build()
+        # Пул соединений обработчиков и уведомлений; публикации в канал идут через publisher_bot
+        request = HTTPXRequest(
+            connection_pool_size=HTTP_POOL_SIZE,
+            pool_timeout=HTTP_POOL_TIMEOUT,
+            connect_timeout=HTTP_CONNECT_TIMEOUT,
+            read_timeout=HTTP_READ_TIMEOUT,
+            http_version=HTTP_VERSION
+        )
+        # HTTP/2 мультиплексирует вызовы Bot API в одном TLS-соединении
+        application = Application.builder().token(TOKEN).request(request).build()
+        # Фиксированные callback_data сравниваются как точные строки, без регулярных выражений
         conv_handler = ConversationHandler(
             entry_points=[
                 CommandHandler('start', start_command),
-                CallbackQueryHandler(handle_carpool_start, pattern="^carpool$")
+                CallbackQueryHandler(handle_carpool_start, pattern=lambda data: data == "carpool")
             ],
             states={
                 TYPE_SELECTION: [CallbackQueryHandler(handle_type_selection)],
@@ -1038,64 +1468,155 @@ async def initialize_bot():
             },
             fallbacks=[
                 CommandHandler('cancel', cancel_command),
-                CallbackQueryHandler(back_to_start, pattern="^back_to_start$")
+                CallbackQueryHandler(back_to_start, pattern=lambda data: data == "back_to_start")
             ],
             allow_reentry=True,
             conversation_timeout=timedelta(minutes=CONVERSATION_TIMEOUT_MINUTES).total_seconds()
         )
         application.add_handler(conv_handler)
         application.add_handler(MessageHandler(filters.PHOTO, handle_any_photo), group=1)
-        application.add_handler(CallbackQueryHandler(admin_approve_application, pattern="^approve_\\d+$"))
-        application.add_handler(CallbackQueryHandler(admin_reject_application, pattern="^reject_\\d+$"))
-        application.add_handler(CallbackQueryHandler(help_inline_handler, pattern="^help_inline$"))
+        application.add_handler(CallbackQueryHandler(admin_approve_application, pattern=APPROVE_CALLBACK_RE))
+        application.add_handler(CallbackQueryHandler(admin_reject_application, pattern=REJECT_CALLBACK_RE))
+        application.add_handler(CallbackQueryHandler(help_inline_handler, pattern=lambda data: data == "help_inline"))
         await application.initialize()
+        # Зависшие отправки в канал занимают только пул публикатора, ответы пользователям их не ждут
+        publisher_bot = Bot(TOKEN, request=HTTPXRequest(
+            connection_pool_size=PUBLISH_CONCURRENCY,
+            pool_timeout=HTTP_POOL_TIMEOUT,
+            connect_timeout=HTTP_CONNECT_TIMEOUT,
+            read_timeout=HTTP_READ_TIMEOUT,
+            http_version=HTTP_VERSION
+        ))
+        await publisher_bot.initialize()
         if WEBHOOK_URL and WEBHOOK_SECRET:
             webhook_url = f"{WEBHOOK_URL}/telegram-webhook/{WEBHOOK_SECRET}"
             await application.bot.set_webhook(url=webhook_url, secret_token=WEBHOOK_SECRET)
-            logger.info(f"Вебхук установлен: {webhook_url}")
+            logger.info("Вебхук установлен: %s", webhook_url)
         else:
             logger.warning("WEBHOOK_URL или WEBHOOK_SECRET не заданы. Вебхук не будет установлен.")
+        application_ready.set()
         logger.info("Бот инициализирован.")
 
 # ========== FastAPI приложение ==========
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse)
+
+# Тело успешного ответа вебхука одинаково для всех запросов — кодируем его один раз
+WEBHOOK_OK_BODY = orjson.dumps({"status": "ok"})
+
+def log_skipped_job(event):
+    if event.code == EVENT_JOB_MAX_INSTANCES:
+        logger.info("Запуск задачи %s пропущен: предыдущий ещё выполняется.", event.job_id)
+    else:
+        logger.info("Запуск задачи %s пропущен: опоздание больше допустимого.", event.job_id)
 
 @app.on_event("startup")
 async def startup_event():
+    global scheduler
     await init_db()
+    await warm_db_pool()
+    await load_rate_limit_history()
     await load_bad_words()
     await initialize_bot()
+    # Задачи добавляются при каждом запуске, поэтому хранить их в БД не нужно;
+    # пропущенные из-за долгой работы запуски схлопываются в один, параллельно задача не выполняется
     scheduler = AsyncIOScheduler(
-        jobstores={'default': SQLAlchemyJobStore(url='sqlite:///jobs.sqlite')},
+        jobstores={'default': MemoryJobStore()},
         executors={'default': AsyncIOExecutor()},
+        job_defaults={'coalesce': True, 'max_instances': 1, 'misfire_grace_time': 300},
         timezone=TIMEZONE
     )
-    scheduler.add_job(check_pending_applications, 'interval', minutes=1)
+    scheduler.add_listener(log_skipped_job, EVENT_JOB_MAX_INSTANCES | EVENT_JOB_MISSED)
+    scheduler.add_job(
+        check_pending_applications, 'interval', minutes=1,
+        id='publish_approved', replace_existing=True
+    )
+    scheduler.add_job(
+        refresh_bad_words, 'interval', seconds=BAD_WORDS_RELOAD_INTERVAL_SECONDS,
+        id='refresh_bad_words', replace_existing=True
+    )
+    scheduler.add_job(
+        prune_rate_limit_history, 'interval', seconds=RATE_LIMIT_WINDOW_SECONDS,
+        id='prune_rate_limit_history', replace_existing=True
+    )
+    scheduler.add_job(
+        optimize_db, 'interval', hours=DB_OPTIMIZE_INTERVAL_HOURS,
+        id='optimize_db', replace_existing=True
+    )
     scheduler.start()
+    update_workers.extend(asyncio.create_task(update_worker()) for _ in range(UPDATE_WORKERS))
     logger.info("FastAPI приложение запущено.")
 
 @app.on_event("shutdown")
 async def shutdown_event():
+    # Новые запуски задач не начинаются, пока закрываются клиент публикатора и пул БД
+    if scheduler:
+        scheduler.shutdown(wait=False)
+    # Даём обработать уже принятые обновления, затем останавливаем обработчики
+    try:
+        await asyncio.wait_for(update_queue.join(), timeout=UPDATE_DRAIN_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        logger.warning("Не обработано обновлений при остановке: %s", update_queue.qsize())
+    for worker in update_workers:
+        worker.cancel()
+    await asyncio.gather(*update_workers, return_exceptions=True)
+    if publisher_bot:
+        await publisher_bot.shutdown()
     db_executor.shutdown(wait=True)
+    close_db_connections()
     logger.info("Пул потоков для БД остановлен.")
 
+def webhook_secret_matches(value: Optional[str]) -> bool:
+    # Сравнение за постоянное время, чтобы не раскрывать секрет по времени ответа
+    if not WEBHOOK_SECRET or value is None:
+        return False
+    return hmac.compare_digest(value.encode(), WEBHOOK_SECRET.encode())
+
+async def process_update_safe(update: Update):
+    # Зависший обработчик не должен навсегда занять update_worker
+    try:
+        await asyncio.wait_for(application.process_update(update), timeout=UPDATE_PROCESS_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        logger.error("Обработка обновления %s прервана по таймауту.", update.update_id)
+    except Exception as e:
+        logger.error("Ошибка обработки обновления %s: %s", update.update_id, e, exc_info=True)
+
+async def update_worker():
+    while True:
+        update = await update_queue.get()
+        try:
+            await process_update_safe(update)
+        finally:
+            update_queue.task_done()
+
 @app.post("/telegram-webhook/{secret}")
 async def telegram_webhook(secret: str, request: Request):
-    if secret != WEBHOOK_SECRET:
+    # Проверка секрета до разбора тела: чужие запросы не стоят ничего, кроме сравнения строк
+    if not (webhook_secret_matches(secret)
+            and webhook_secret_matches(request.headers.get("X-Telegram-Bot-Api-Secret-Token"))):
         raise HTTPException(status_code=403, detail="Invalid secret")
-    if application is None:
+    # После запуска это проверка флага без ожидания блокировки
+    if not application_ready.is_set():
         await initialize_bot()
-        if application is None:
+        if not application_ready.is_set():
             logger.error("Критическая ошибка: не удалось инициализировать приложение Telegram.")
             raise HTTPException(status_code=500, detail="Bot not initialized")
     try:
-        data = await request.json()
+        data = orjson.loads(await request.body())
         update = Update.de_json(data, application.bot)
-        await application.process_update(update)
-        return JSONResponse(status_code=200, content={"status": "ok"})
+    except orjson.JSONDecodeError as e:
+        # Повтор того же тела не поможет, поэтому не 500
+        logger.warning("Вебхук получил некорректный JSON: %s", e)
+        raise HTTPException(status_code=400, detail="Invalid JSON")
     except Exception as e:
-        logger.error(f"Ошибка вебхука: {e}", exc_info=True)
+        logger.error("Ошибка вебхука: %s", e, exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
+    # Отвечаем Telegram сразу, обработка идёт в фоне; при переполнении очереди Telegram повторит доставку
+    try:
+        update_queue.put_nowait(update)
+    except asyncio.QueueFull:
+        logger.warning("Очередь обновлений заполнена, обновление %s отклонено.", update.update_id)
+        raise HTTPException(status_code=429, detail="Update queue is full")
+    return Response(content=WEBHOOK_OK_BODY, media_type="application/json")
 
 @app.get("/")
 async def root():